@@ -58,3 +58,10 @@ def get_retention(db: Session, start_date: datetime, windows: int = 3):
         rate = round(retained / len(base_users), 3)
         result.append({"day": str(day.date()), "retained_users": retained, "retention_rate": rate})
     return result
+
+def get_activity(db: Session, start: datetime, end: datetime):
+    return (
+        db.query(models.Event.event_id, models.Event.occurred_at, models.Event.user_id, models.Event.event_type)
+        .filter(models.Event.occurred_at >= start, models.Event.occurred_at < end)
+        .all()
+    )
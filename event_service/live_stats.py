@@ -0,0 +1,220 @@
+import asyncio
+import json
+import logging
+import threading
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import crud
+
+logger = logging.getLogger("event_service")
+
+
+def _today() -> date:
+    # SQLite хранит occurred_at без таймзоны: смещение отбрасывается, остаётся "настенное"
+    # время клиента, и дату события (как и /stats/dau) берём от него. "Сегодня" считаем по UTC,
+    # поэтому события с положительным смещением после местной полуночи относятся к завтрашнему
+    # дню — их копим заранее (см. LiveStats._days)
+    return datetime.now(timezone.utc).date()
+
+
+class LiveStats:
+    """
+    Инкрементальные счётчики за текущий день (уникальные пользователи и количество
+    событий по event_type) и рассылка дельт подписчикам SSE/WebSocket.
+
+    record() вызывается из синхронных обработчиков (потоки threadpool),
+    publish() и подписчики работают в event loop. Подписчики не держат собственных
+    очередей: все ждут одно общее asyncio.Event, а payload сериализуется один раз
+    на тик, поэтому простаивающие клиенты почти ничего не стоят.
+
+    Счётчики хранятся по датам: сегодня и завтра. В полночь UTC завтрашние
+    становятся текущими, поэтому цифры совпадают с /stats/dau за ту же дату.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        # record() во время сверки: событие могло попасть или не попасть в выборку из БД
+        self._pending: Optional[List[Tuple[str, datetime, str, str]]] = None
+        self._day = _today()
+        self._days: Dict[date, Tuple[Set[str], Dict[str, int]]] = {}
+        self._dirty_types: Set[str] = set()
+        self._roll_day(self._day)
+        self._reset = False
+
+        self.version = 0
+        self._delta: Optional[str] = None
+        self._snapshot = self._build_snapshot()
+        self._changed: Optional[asyncio.Event] = None
+        self.closed = False
+
+    # -------------------------
+    # Обновление счётчиков
+    # -------------------------
+    def _roll_day(self, today: date):
+        """Под локом: новый день — накопленные заранее счётчики становятся текущими"""
+        self._day = today
+        self._days = {d: self._days.get(d, (set(), {})) for d in (today, today + timedelta(days=1))}
+        self._dirty_types.clear()
+        self._users_dirty = False
+        self._reset = True
+
+    def record(self, event_id: str, occurred_at: Optional[datetime], user_id: str, event_type: str):
+        """Учитывает событие; вызывать после commit"""
+        if occurred_at is None:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((event_id, occurred_at, user_id, event_type))
+            today = _today()
+            if today != self._day:
+                self._roll_day(today)
+            self._apply(occurred_at, user_id, event_type)
+
+    def _apply(self, occurred_at: datetime, user_id: str, event_type: str):
+        """Под локом"""
+        # как в БД: дата по "настенному" времени, смещение не учитываем
+        day = occurred_at.date()
+        if day not in self._days:
+            return
+        users, counts = self._days[day]
+        new_user = user_id not in users
+        users.add(user_id)
+        counts[event_type] = counts.get(event_type, 0) + 1
+        if day == self._day:
+            self._users_dirty = self._users_dirty or new_user
+            self._dirty_types.add(event_type)
+
+    def reconcile(self, db: Session):
+        """
+        Сверка счётчиков с БД (при старте сервиса и через /stats/live/reconcile).
+        record(), пришедшие во время запроса, буферизуются и после подмены счётчиков
+        применяются заново — кроме событий, которые уже попали в выборку.
+        """
+        with self._reconcile_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                today = _today()
+                start = datetime.combine(today, time.min)
+                rows = crud.get_activity(db, start, start + timedelta(days=2))
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+
+            days = {d: (set(), {}) for d in (today, today + timedelta(days=1))}
+            seen = set()
+            for event_id, occurred_at, user_id, event_type in rows:
+                seen.add(event_id)
+                users, counts = days[occurred_at.date()]
+                users.add(user_id)
+                counts[event_type] = counts.get(event_type, 0) + 1
+
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self._day = today
+                self._days = days
+                for event_id, occurred_at, user_id, event_type in pending:
+                    if event_id not in seen:
+                        self._apply(occurred_at, user_id, event_type)
+                self._dirty_types.clear()
+                self._users_dirty = False
+                self._reset = True
+                users, counts = days[today]
+        logger.info(f"📡 Live-статистика за {today}: {len(users)} пользователей, {sum(counts.values())} событий")
+
+    # -------------------------
+    # Рассылка
+    # -------------------------
+    def _build_snapshot(self) -> str:
+        users, counts = self._days[self._day]
+        return json.dumps({
+            "type": "snapshot",
+            "date": str(self._day),
+            "unique_users": len(users),
+            "event_counts": dict(counts),
+        }, ensure_ascii=False)
+
+    def publish(self) -> bool:
+        """Собирает дельту с прошлого тика и будит подписчиков. Без изменений — ничего не делает"""
+        with self._lock:
+            today = _today()
+            if today != self._day:
+                self._roll_day(today)
+            if not (self._reset or self._users_dirty or self._dirty_types):
+                return False
+
+            snapshot = self._build_snapshot()
+            if self._reset:
+                delta = snapshot
+            else:
+                users, counts = self._days[self._day]
+                payload = {"type": "delta", "date": str(self._day)}
+                if self._users_dirty:
+                    payload["unique_users"] = len(users)
+                if self._dirty_types:
+                    payload["event_counts"] = {t: counts[t] for t in self._dirty_types}
+                delta = json.dumps(payload, ensure_ascii=False)
+
+            self._dirty_types.clear()
+            self._users_dirty = False
+            self._reset = False
+
+        self._snapshot, self._delta = snapshot, delta
+        self.version += 1
+        self._wake()
+        return True
+
+    def _wake(self):
+        if self._changed is not None:
+            changed, self._changed = self._changed, asyncio.Event()
+            changed.set()
+
+    def close(self):
+        """Остановка сервера: будит подписчиков, чтобы их потоки завершились"""
+        self.closed = True
+        self._wake()
+
+    def current(self) -> Tuple[int, str]:
+        """Версия и полный снимок — с них подписчик начинает"""
+        return self.version, self._snapshot
+
+    async def wait(self, version: int, timeout: Optional[float] = None) -> Tuple[int, Optional[str]]:
+        """
+        Ждёт следующую публикацию после version. Возвращает новую версию и payload:
+        дельту, если подписчик ничего не пропустил, иначе полный снимок.
+        При таймауте или после close() payload = None.
+        """
+        if self.closed:
+            return version, None
+        if self.version == version:
+            if self._changed is None:
+                self._changed = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return version, None
+        if self.closed:
+            return version, None
+        if self.version == version + 1:
+            return self.version, self._delta
+        return self.version, self._snapshot
+
+    async def run(self, interval: float):
+        """Фоновая задача: публикация дельт раз в interval секунд"""
+        # новый event loop (перезапуск lifespan) — новое Event
+        self._changed = asyncio.Event()
+        self.closed = False
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f"Ошибка публикации live-статистики: {e}")
+
+
+live_stats = LiveStats()
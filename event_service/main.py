@@ -1,10 +1,13 @@
 import os
+import asyncio
 import logging
 import json
+import signal
+import threading
 from typing import List
 from dateutil.parser import parse
-from fastapi import FastAPI, Request, Depends, HTTPException, Query, Body
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, Depends, HTTPException, Query, Body, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
@@ -13,10 +16,18 @@ from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from limits import parse as parse_limit
 
-from .database import engine, Base, get_db
+from .database import engine, Base, get_db, SessionLocal
 from . import models, schemas, crud, import_events
+from .live_stats import live_stats
+
+# Интервал рассылки дельт live-статистики и keepalive для SSE (секунды)
+LIVE_STATS_INTERVAL = float(os.getenv("LIVE_STATS_INTERVAL", "1.0"))
+LIVE_STATS_KEEPALIVE = float(os.getenv("LIVE_STATS_KEEPALIVE", "15.0"))
+# slowapi не работает с WebSocket, поэтому подключения к /ws/stats лимитируем вручную
+WS_STATS_LIMIT = parse_limit("60/minute")
 
 # -------------------------
 # Логирование
@@ -24,6 +35,35 @@ from . import models, schemas, crud, import_events
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger("event_service")
 
+def _hook_exit_signals(callback):
+    """
+    uvicorn запускает shutdown lifespan только после закрытия всех соединений,
+    поэтому бесконечные SSE-потоки надо завершать по самому сигналу остановки.
+    Оборачиваем уже установленные обработчики SIGINT/SIGTERM (uvicorn), сохраняя их
+    поведение. Возвращает функцию, которая восстанавливает прежние обработчики.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return lambda: None
+
+    previous = {}
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        prev = signal.getsignal(sig)
+        if not callable(prev):
+            continue
+
+        def handler(signum, frame, prev=prev):
+            callback()
+            prev(signum, frame)
+
+        previous[sig] = prev
+        signal.signal(sig, handler)
+
+    def restore():
+        for sig, prev in previous.items():
+            signal.signal(sig, prev)
+
+    return restore
+
 # -------------------------
 # Lifespan: стартовый импорт CSV и создание таблиц
 # -------------------------
@@ -48,8 +88,27 @@ async def lifespan(app: FastAPI):
     else:
         logger.warning(f"⚠️ CSV файл не найден: {csv_path}")
 
+    # -----------------
+    # Live-статистика: сверка с БД и фоновая рассылка
+    # -----------------
+    db = SessionLocal()
+    try:
+        live_stats.reconcile(db)
+    finally:
+        db.close()
+    live_stats.publish()
+    broadcaster = asyncio.create_task(live_stats.run(LIVE_STATS_INTERVAL))
+    loop = asyncio.get_running_loop()
+    restore_signals = _hook_exit_signals(lambda: loop.call_soon_threadsafe(live_stats.close))
+
     yield
 
+    restore_signals()
+    live_stats.close()
+    broadcaster.cancel()
+    with suppress(asyncio.CancelledError):
+        await broadcaster
+
 # -------------------------
 # Создание FastAPI
 # -------------------------
@@ -127,6 +186,7 @@ def ingest_events(request: Request, events: List[schemas.EventCreate] = Body(...
         db.add(evt)
         db.commit()
         db.refresh(evt)
+        live_stats.record(evt.event_id, evt.occurred_at, evt.user_id, evt.event_type)
         created.append(evt)
     return created
 
@@ -156,3 +216,61 @@ def stats_retention(request: Request, start_date: str = Query(...), windows: int
     except Exception:
         raise HTTPException(status_code=400, detail="Неправильный формат даты")
     return JSONResponse(content=crud.get_retention(db, start, windows))
+
+@app.get("/stats/live")
+@limiter.limit("60/minute")
+async def stats_live_sse(request: Request):
+    """Server-Sent Events: снимок за сегодня, затем дельты счётчиков"""
+    async def stream():
+        version, payload = live_stats.current()
+        yield f"data: {payload}\n\n"
+        while not live_stats.closed and not await request.is_disconnected():
+            version, payload = await live_stats.wait(version, LIVE_STATS_KEEPALIVE)
+            if live_stats.closed:
+                break
+            yield f"data: {payload}\n\n" if payload is not None else ": keepalive\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/stats/live/reconcile")
+@limiter.limit("10/minute")
+def stats_live_reconcile(request: Request, db: Session = Depends(get_db)):
+    """Пересчитать live-счётчики по БД, например после импорта CSV через CLI"""
+    live_stats.reconcile(db)
+    return {"status": "ok"}
+
+@app.websocket("/ws/stats")
+async def stats_live_ws(websocket: WebSocket):
+    """WebSocket-вариант /stats/live"""
+    if not limiter.limiter.hit(WS_STATS_LIMIT, "ws_stats", get_remote_address(websocket)):
+        await websocket.close(code=1008, reason="Too many requests")
+        return
+    await websocket.accept()
+
+    async def send_updates():
+        version, payload = live_stats.current()
+        await websocket.send_text(payload)
+        while True:
+            version, payload = await live_stats.wait(version)
+            if live_stats.closed:
+                await websocket.close(code=1001)
+                return
+            await websocket.send_text(payload)
+
+    sender = asyncio.create_task(send_updates())
+    try:
+        # входящие сообщения не нужны, но их надо вычитывать, чтобы сразу заметить отключение
+        while not sender.done():
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        with suppress(asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+            await sender
@@ -1,10 +1,12 @@
 import pytest
 from event_service.database import get_db
-from event_service import models
+from event_service import models, live_stats
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import date, datetime
 import uuid
 
+LIVE_DAY = date(2025, 10, 30)
+
 
 @pytest.fixture(scope="function")
 def test_events():
@@ -46,3 +48,10 @@ def test_events():
     db.query(models.Event).delete()
     db.commit()
     db.close()
+
+
+@pytest.fixture()
+def live_day(monkeypatch):
+    """Фиксирует "сегодня" для live-статистики, чтобы тесты не зависели от даты запуска"""
+    monkeypatch.setattr(live_stats, "_today", lambda: LIVE_DAY)
+    return LIVE_DAY
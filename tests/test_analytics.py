@@ -1,7 +1,10 @@
 import pytest
+import json
 from fastapi.testclient import TestClient
-from datetime import date
+from datetime import date, datetime
 from event_service.main import app
+from event_service.database import get_db
+from event_service import crud, live_stats
 
 client = TestClient(app)
 
@@ -43,3 +46,27 @@ def test_retention_stats():
     # backend возвращает список, а не словарь
     assert isinstance(data, list)
     assert all("day" in d and "retained_users" in d for d in data)
+
+
+@pytest.mark.usefixtures("test_events")
+def test_activity_and_reconcile(monkeypatch):
+    """Live-счётчики сверяются с БД: пользователи и event_type за один день."""
+    gen = get_db()
+    db = next(gen)
+    try:
+        rows = crud.get_activity(db, datetime(2025, 10, 30), datetime(2025, 10, 31))
+        assert [(r.user_id, r.event_type) for r in rows] == [("user1", "login")]
+
+        monkeypatch.setattr(live_stats, "_today", lambda: date(2025, 10, 31))
+        stats = live_stats.LiveStats()
+        stats.reconcile(db)
+        assert stats.publish() is True
+
+        _, snapshot = stats.current()
+        data = json.loads(snapshot)
+        assert data["type"] == "snapshot"
+        assert data["date"] == "2025-10-31"
+        assert data["unique_users"] == 1
+        assert data["event_counts"] == {"click": 1}
+    finally:
+        gen.close()
@@ -1,9 +1,17 @@
 import pytest
+import json
+import queue
+import signal
+import threading
+import anyio
 from fastapi.testclient import TestClient
+from event_service import main
 from event_service.main import app, get_db
-from event_service import models
+from event_service.live_stats import live_stats
+import event_service.live_stats as live_stats_module
+from event_service import models, crud
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import date, datetime
 import uuid
 
 client = TestClient(app)
@@ -74,3 +82,193 @@ def test_idempotency_post_events(db_session: Session):
 
     all_events = db_session.query(models.Event).filter(models.Event.event_id == eid).all()
     assert len(all_events) == 1, f"expected 1 event, got {len(all_events)}"
+
+
+def _live_event(user_id="live_user", event_type="signup"):
+    return {
+        "event_id": str(uuid.uuid4()),
+        "occurred_at": "2025-10-30T09:00:00Z",
+        "user_id": user_id,
+        "event_type": event_type,
+        "properties": {},
+    }
+
+
+def test_post_events_updates_live_stats(db_session: Session, live_day):
+    """POST /events обновляет live-счётчики, дубликат по event_id не учитывается"""
+    live_stats.reconcile(db_session)
+    event = _live_event()
+
+    assert client.post("/events", json=[event]).status_code == 200
+    assert client.post("/events", json=[event]).status_code == 200
+
+    live_stats.publish()
+    _, snapshot = live_stats.current()
+    stats = json.loads(snapshot)
+    assert stats["date"] == str(live_day)
+    assert stats["unique_users"] == 1
+    assert stats["event_counts"] == {"signup": 1}
+
+
+def test_live_stats_match_dau_for_offset_events(db_session: Session, monkeypatch):
+    """Событие с +03:00 после местной полуночи учитывается в live-счётчиках того же дня, что и в /stats/dau"""
+    today = [date(2025, 10, 30)]
+    monkeypatch.setattr(live_stats_module, "_today", lambda: today[0])
+    live_stats.reconcile(db_session)
+
+    event = _live_event()
+    event["occurred_at"] = "2025-10-31T01:30:00+03:00"
+    assert client.post("/events", json=[event]).status_code == 200
+
+    today[0] = date(2025, 10, 31)
+    live_stats.publish()
+    stats = json.loads(live_stats.current()[1])
+
+    dau = client.get("/stats/dau?from_=2025-10-31&to=2025-11-01").json()
+    assert stats["date"] == "2025-10-31"
+    assert dau == [{"date": "2025-10-31", "unique_users": stats["unique_users"]}]
+    assert stats["unique_users"] == 1
+    assert stats["event_counts"] == {"signup": 1}
+
+
+def test_reconcile_replays_records_made_during_query(db_session: Session, live_day, monkeypatch):
+    """record() во время сверки не теряется и не учитывается дважды"""
+    live_stats.reconcile(db_session)
+    committed_before = models.Event(**{**_live_event("user_a"), "occurred_at": datetime(2025, 10, 30, 9)})
+    committed_after = models.Event(**{**_live_event("user_b"), "occurred_at": datetime(2025, 10, 30, 10)})
+    db_session.add(committed_before)
+    db_session.commit()
+
+    real_get_activity = crud.get_activity
+
+    def racing_get_activity(db, start, end):
+        rows = real_get_activity(db, start, end)
+        # событие уже в выборке, а его record() пришёл после запроса
+        live_stats.record(committed_before.event_id, committed_before.occurred_at, "user_a", "signup")
+        # событие закоммичено и учтено уже после запроса
+        db_session.add(committed_after)
+        db_session.commit()
+        live_stats.record(committed_after.event_id, committed_after.occurred_at, "user_b", "signup")
+        return rows
+
+    monkeypatch.setattr(crud, "get_activity", racing_get_activity)
+    live_stats.reconcile(db_session)
+
+    live_stats.publish()
+    stats = json.loads(live_stats.current()[1])
+    assert stats["unique_users"] == 2
+    assert stats["event_counts"] == {"signup": 2}
+
+
+def test_ws_stats_snapshot_then_delta(db_session: Session, live_day, monkeypatch):
+    """/ws/stats: сначала снимок за сегодня, после POST /events — дельта"""
+    monkeypatch.setattr(main, "LIVE_STATS_INTERVAL", 0.05)
+    with TestClient(app) as c:
+        with c.websocket_connect("/ws/stats") as ws:
+            first = ws.receive_json()
+            assert first["type"] == "snapshot"
+            assert first["date"] == str(live_day)
+            assert first["unique_users"] == 0
+
+            assert c.post("/events", json=[_live_event()]).status_code == 200
+
+            delta = ws.receive_json()
+            assert delta["type"] == "delta"
+            assert delta["unique_users"] == 1
+            assert delta["event_counts"] == {"signup": 1}
+
+
+def _open_sse(c: TestClient):
+    """
+    TestClient дочитывает ответ до конца, поэтому бесконечный поток /stats/live
+    запускаем как ASGI-вызов в его event loop. Возвращает future запроса, очередь
+    полученных SSE-сообщений и функцию, которая присылает http.disconnect.
+    """
+    chunks = queue.Queue()
+    disconnected = c.portal.call(anyio.Event)
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.put(message["body"].decode())
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/stats/live",
+        "raw_path": b"/stats/live",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"testserver")],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    stream = c.portal.start_task_soon(app, scope, receive, send)
+    return stream, chunks, lambda: c.portal.call(disconnected.set)
+
+
+def _sse_message(chunks: queue.Queue):
+    return json.loads(chunks.get(timeout=5).removeprefix("data: "))
+
+
+def test_sse_stats_snapshot_then_delta(db_session: Session, live_day, monkeypatch):
+    """/stats/live: сначала снимок за сегодня, после POST /events — дельта"""
+    monkeypatch.setattr(main, "LIVE_STATS_INTERVAL", 0.05)
+    with TestClient(app) as c:
+        stream, chunks, disconnect = _open_sse(c)
+        try:
+            first = _sse_message(chunks)
+            assert first["type"] == "snapshot"
+            assert first["date"] == str(live_day)
+            assert first["unique_users"] == 0
+
+            assert c.post("/events", json=[_live_event()]).status_code == 200
+
+            delta = _sse_message(chunks)
+            assert delta["type"] == "delta"
+            assert delta["unique_users"] == 1
+            assert delta["event_counts"] == {"signup": 1}
+        finally:
+            disconnect()
+            stream.result(timeout=5)
+
+
+def test_sse_stats_ends_on_shutdown(db_session: Session, live_day):
+    """Остановка сервиса завершает SSE-поток, не дожидаясь отключения клиента"""
+    c = TestClient(app)
+    c.__enter__()
+    try:
+        stream, chunks, _ = _open_sse(c)
+        assert _sse_message(chunks)["type"] == "snapshot"
+    finally:
+        stopper = threading.Thread(target=c.__exit__, args=(None, None, None), daemon=True)
+        stopper.start()
+        stopper.join(timeout=10)
+    assert not stopper.is_alive(), "shutdown завис на открытом SSE-подписчике"
+    assert stream.done()
+
+
+def test_exit_signal_hook_chains_previous_handler():
+    """Сигнал остановки сначала закрывает live-потоки, затем уходит в обработчик uvicorn"""
+    calls = []
+    previous = signal.signal(signal.SIGTERM, lambda signum, frame: calls.append("uvicorn"))
+    try:
+        restore = main._hook_exit_signals(lambda: calls.append("live_stats"))
+        signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+        restore()
+        assert calls == ["live_stats", "uvicorn"]
+        signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+        assert calls == ["live_stats", "uvicorn", "uvicorn"]
+    finally:
+        signal.signal(signal.SIGTERM, previous)
@@ -0,0 +1,71 @@
+import asyncio
+import json
+from datetime import date, datetime, timedelta
+from event_service import live_stats
+from event_service.live_stats import LiveStats
+
+
+def _at(day, hour=12):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+
+
+def test_live_stats_counts_today_only(live_day):
+    """Счётчики учитывают только события за сегодня"""
+    stats = LiveStats()
+    stats.record("e1", _at(live_day, 9), "user1", "login")
+    stats.record("e2", _at(live_day, 10), "user1", "click")
+    stats.record("e3", _at(live_day, 11), "user2", "click")
+    stats.record("e4", _at(live_day - timedelta(days=2)), "user3", "click")
+
+    assert stats.publish() is True
+    _, snapshot = stats.current()
+    data = json.loads(snapshot)
+    assert data["date"] == str(live_day)
+    assert data["unique_users"] == 2
+    assert data["event_counts"] == {"login": 1, "click": 2}
+
+
+def test_live_stats_delta_and_missed_versions(live_day):
+    """Подписчик получает дельту, а отставший — полный снимок"""
+    stats = LiveStats()
+    stats.record("e5", _at(live_day), "user1", "login")
+    stats.publish()
+    version, _ = stats.current()
+
+    assert stats.publish() is False, "без новых событий публиковать нечего"
+
+    stats.record("e6", _at(live_day), "user1", "purchase")
+    stats.publish()
+    new_version, payload = asyncio.run(stats.wait(version, timeout=0.1))
+    delta = json.loads(payload)
+    assert new_version == version + 1
+    assert delta["type"] == "delta"
+    assert delta["event_counts"] == {"purchase": 1}
+    assert "unique_users" not in delta
+
+    stats.record("e7", _at(live_day), "user2", "login")
+    stats.publish()
+    _, payload = asyncio.run(stats.wait(version, timeout=0.1))
+    assert json.loads(payload)["type"] == "snapshot"
+
+    current, _ = stats.current()
+    assert asyncio.run(stats.wait(current, timeout=0.01)) == (current, None)
+
+
+def test_live_stats_keeps_next_day_events_until_rollover(monkeypatch):
+    """Событие со смещением после местной полуночи попадает в счётчики следующего дня"""
+    today = [date(2025, 10, 30)]
+    monkeypatch.setattr(live_stats, "_today", lambda: today[0])
+    stats = LiveStats()
+
+    # 2025-10-30 22:30 UTC, но "настенная" дата в БД — 2025-10-31
+    stats.record("e8", datetime.fromisoformat("2025-10-31T01:30:00+03:00"), "user1", "login")
+    assert stats.publish() is False, "сегодняшние счётчики не меняются"
+
+    today[0] = date(2025, 10, 31)
+    assert stats.publish() is True
+    data = json.loads(stats.current()[1])
+    assert data["type"] == "snapshot"
+    assert data["date"] == "2025-10-31"
+    assert data["unique_users"] == 1
+    assert data["event_counts"] == {"login": 1}